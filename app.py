@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
-import json
+import orjson
 import datetime
-import google.generativeai as genai
-import plotly.express as px
-import plotly.graph_objects as go
 import uuid
 import time
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from streamlit_gsheets import GSheetsConnection
 
 # -----------------------------------------------------------------------------
@@ -19,6 +20,16 @@ CARD_BG_COLOR = "#0E1117" # 메인 카드 배경색 (앱 배경색과 동일)
 
 # 모델 우선순위
 MODEL_PRIORITY_LIST = ["gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-1.5-flash"]
+MODEL_MAX_ATTEMPTS = 2      # 모델당 시도 횟수 (지수 백오프)
+MODEL_COOLDOWN_SEC = 60     # 가용성 오류(429/5xx/시간 초과/인증)로 실패한 모델을 건너뛰는 시간 (서킷 브레이커)
+MODEL_TIMEOUT_SEC = 30
+MODEL_HEDGE_DELAY_SEC = 10  # 1순위 모델이 이 시간 안에 답하지 않으면 백업 모델을 한 번만 추가 호출 (2.5-flash의 thinking 포함 통상 지연보다 길게)
+
+# load_data에서 한 번만 계산하는 파생 열 (시트에는 저장하지 않음)
+DERIVED_COLS = ["category_parsed", "keywords_parsed", "week_label", "date_str", "tags_html", "sheet_pos"]
+
+# 기록/대시보드 목록에서 한 번에 그리는 카드 수 ('더 보기'로 늘림)
+LIST_PAGE_SIZE = 20
 
 DEFAULT_CATEGORIES = ["기획", "디자인", "개발", "데이터", "QA", "비즈니스", "협업", "HR", "기타"]
 
@@ -28,94 +39,266 @@ PURPLE_PALETTE = {
     800: "#4A2EA5", 900: "#3F2C83", 950: "#261A4C"
 }
 
+@st.cache_resource
 def get_connection():
     return st.connection("gsheets", type=GSheetsConnection)
 
-def load_data():
+def load_data_fresh():
+    # 캐시를 거치지 않고 시트를 직접 읽음. 읽기 실패는 예외로 올려 보냄
+    # (빈 프레임으로 삼키면 그 결과가 캐시되고, 쓰기 경로가 시트 전체를 빈 데이터로 덮어쓸 수 있음)
     conn = get_connection()
-    try:
-        df = conn.read(ttl=0)
-        if df.empty:
-            return pd.DataFrame(columns=["id", "date", "writer", "text", "keywords", "category"])
-        
-        df.columns = [c.strip().lower() for c in df.columns]
-        required_cols = ["id", "date", "writer", "text", "keywords", "category"]
-        for col in required_cols:
-            if col not in df.columns:
-                df[col] = ""
-
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.normalize()
-        
-        df = df.fillna("")
-        return df
-    except:
+    df = conn.read(ttl=0)
+    if df.empty:
         return pd.DataFrame(columns=["id", "date", "writer", "text", "keywords", "category"])
+    
+    df.columns = [c.strip().lower() for c in df.columns]
+    required_cols = ["id", "date", "writer", "text", "keywords", "category"]
+    for col in required_cols:
+        if col not in df.columns:
+            df[col] = ""
+
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.normalize()
+        # 시트의 원래 행 순서를 기억해 두고(저장 시 복원), 화면용으로는 fillna("") 전(datetime64)에 최신순으로 한 번 정렬.
+        # 필터/위치 인덱스 조회는 순서를 유지하므로 목록에서 다시 정렬하지 않음
+        df['sheet_pos'] = range(len(df))
+        df = df.sort_values('date', ascending=False, kind='mergesort')
+
+    valid_dates = df['date'].dropna()
+    df['week_label'] = get_week_labels(valid_dates) # 날짜가 없는 행은 NaN -> fillna("")
+    df['date_str'] = valid_dates.dt.strftime('%Y-%m-%d')
+    
+    df = df.fillna("")
+    # 문자열 열은 object 대신 Arrow 문자열로 보관 (메모리 절약, 비교/unique가 C 커널에서 실행)
+    df = df.astype({c: "string[pyarrow]" for c in required_cols if c != "date"})
+    # 행마다 반복하던 JSON 파싱을 로드 시점에 한 번만 수행 (셀 단위 orjson 파싱이라 깨진 셀이 이웃 행에 섞이지 않음)
+    df['category_parsed'] = df['category'].map(parse_categories)
+    df['keywords_parsed'] = df['keywords'].map(parse_keywords)
+    # 태그 HTML은 로드 시점에 한 번만 만들고, 목록에서는 그대로 st.markdown에 넘김
+    df['tags_html'] = [build_tags_html(c, k) for c, k in zip(df['category_parsed'], df['keywords_parsed'])]
+    # id -> 행 해시 인덱스 (수정/삭제 시 O(1) 조회)
+    df = df.set_index('id', drop=False).rename_axis(None)
+    df.attrs['version'] = uuid.uuid4().hex # 로드할 때마다 새로 붙는 스냅샷 토큰 (캐시 키)
+    return df
+
+# 캐시는 서버 프로세스 전체(모든 세션)가 공유하고 쓰기마다 비워짐. 화면 표시용이며,
+# 쓰기 경로는 시트 최신본(load_data_fresh)을 기준으로 함 (시트에서 직접 고친 내용을 덮어쓰지 않도록).
+# cache_resource는 호출마다 DataFrame을 복사하지 않으므로 반환된 df는 절대 직접 수정하지 말 것 (읽기 전용)
+# 예외는 캐시되지 않으므로 일시적인 읽기 실패는 다음 rerun에서 바로 재시도됨
+@st.cache_resource(ttl="10m", show_spinner=False)
+def load_data():
+    return load_data_fresh()
+
+def hash_frame(df):
+    # 캐시 키용 해시. 리스트 파생 열이 있으면 Streamlit 기본 해시가 pickle로 폴백되므로 원본 열만 해시
+    return pd.util.hash_pandas_object(df.drop(columns=DERIVED_COLS, errors='ignore')).to_numpy().tobytes()
+
+def data_version(df):
+    # load_data 스냅샷이면 O(1) 토큰, 직접 만든 프레임이면 내용 해시
+    return df.attrs.get('version') or hash_frame(df)
 
 def save_data_to_sheet(df):
     conn = get_connection()
-    save_df = df.copy()
+    if 'sheet_pos' in df.columns:
+        # 메모리에서는 최신순이지만 시트는 원래 행 순서 그대로 저장 (새 행은 sheet_pos가 없으므로 끝에 추가)
+        df = df.sort_values('sheet_pos', kind='mergesort', na_position='last')
+    # 파생 열을 뺀 사본(drop)이 이미 새 프레임이므로 date 열은 그 위에서 바로 교체
+    save_df = df.drop(columns=DERIVED_COLS, errors='ignore')
     if 'date' in save_df.columns:
-        save_df['date'] = pd.to_datetime(save_df['date']).dt.strftime('%Y-%m-%d')
+        # load_data/build_row/update_entry가 채워 둔 date_str을 재사용하고, 비어 있는 행만 strftime
+        date_str = df['date_str'] if 'date_str' in df.columns else pd.Series(None, index=df.index, dtype=object)
+        missing = date_str.isna().to_numpy()
+        if missing.any():
+            date_str = date_str.copy()
+            date_str.iloc[missing] = pd.to_datetime(df['date'].iloc[missing]).dt.strftime('%Y-%m-%d').to_numpy()
+        save_df['date'] = date_str.to_numpy() # df와 save_df는 같은 순서이므로 라벨 정렬 없이 위치로 대입
     conn.update(data=save_df)
+    load_data.clear()
+
+def build_row(entry_id, writer, text, keywords, categories, date_val):
+    cat_str = orjson.dumps(categories if isinstance(categories, list) else [str(categories)]).decode()
+    kw_str = orjson.dumps(keywords if isinstance(keywords, list) else [str(keywords)]).decode()
+    date = pd.to_datetime(date_val).normalize()
+    return {
+        "id": entry_id, "date": date, "date_str": date.strftime('%Y-%m-%d'),
+        "writer": writer, "text": text, "keywords": kw_str, "category": cat_str
+    }
+
+def save_many(entries):
+    # entries: (entry_id, writer, text, keywords, categories, date_val) 튜플 목록
+    # 행을 리스트로 모아 concat/시트 저장을 한 번만 수행
+    rows = [build_row(*e) for e in entries]
+    if not rows: return
+    df = load_data_fresh() # 쓰기 직전에 읽은 최신본 위에서 수정 (읽기~쓰기 사이 다른 사용자의 저장이 사라지지 않게)
+    new_data = pd.DataFrame(rows).set_index('id', drop=False).rename_axis(None)
+    save_data_to_sheet(pd.concat([df, new_data]))
 
 def save_entry(entry_id, writer, text, keywords, categories, date_val):
-    df = load_data()
-    cat_str = json.dumps(categories if isinstance(categories, list) else [str(categories)], ensure_ascii=False)
-    kw_str = json.dumps(keywords if isinstance(keywords, list) else [str(keywords)], ensure_ascii=False)
-
-    new_data = pd.DataFrame({
-        "id": [entry_id], "date": [pd.to_datetime(date_val).normalize()],
-        "writer": [writer], "text": [text], "keywords": [kw_str], "category": [cat_str] 
-    })
-    df = pd.concat([df, new_data], ignore_index=True)
-    save_data_to_sheet(df)
+    save_many([(entry_id, writer, text, keywords, categories, date_val)])
 
 def update_entry(entry_id, writer, text, keywords, categories, date_val):
-    df = load_data()
-    idx = df[df['id'] == entry_id].index
-    if not idx.empty:
-        df.at[idx[0], 'writer'] = writer
-        df.at[idx[0], 'text'] = text
-        df.at[idx[0], 'keywords'] = json.dumps(keywords, ensure_ascii=False)
-        df.at[idx[0], 'category'] = json.dumps(categories, ensure_ascii=False)
-        df.at[idx[0], 'date'] = pd.to_datetime(date_val).normalize()
+    df = load_data_fresh() # 캐시와 공유하지 않는 새 프레임이므로 복사 불필요
+    if entry_id in df.index:
+        date = pd.to_datetime(date_val).normalize()
+        # id 인덱스 조회 한 번에 여러 열을 함께 갱신
+        df.loc[entry_id, ['writer', 'text', 'keywords', 'category', 'date', 'date_str']] = [
+            writer, text, orjson.dumps(keywords).decode(), orjson.dumps(categories).decode(),
+            date, date.strftime('%Y-%m-%d')]
         save_data_to_sheet(df)
 
-def delete_entry(entry_id):
-    df = load_data()
-    df = df[df['id'] != entry_id]
+def delete_entries(entry_ids):
+    # 여러 건을 한 번의 drop + 시트 저장으로 삭제
+    df = load_data_fresh()
+    df = df.drop(index=list(entry_ids), errors='ignore')
     save_data_to_sheet(df)
 
+def delete_entry(entry_id):
+    delete_entries([entry_id])
+
+def get_entry(df, entry_id):
+    # id로 현재 스냅샷의 행을 조회 (없으면 빈 dict)
+    if entry_id not in df.index: return {}
+    row = df.loc[entry_id]
+    if isinstance(row, pd.DataFrame): row = row.iloc[0] # id 중복 시 첫 행
+    return row.to_dict()
+
 def parse_categories(cat_data):
     try:
         if isinstance(cat_data, list): return cat_data
         cat_data = str(cat_data).strip()
-        if cat_data.startswith("["): return json.loads(cat_data)
+        if cat_data.startswith("["): return orjson.loads(cat_data)
         return [c.strip() for c in cat_data.split(",")] if "," in cat_data else [cat_data] if cat_data else ["기타"]
-    except: return ["기타"]
+    except orjson.JSONDecodeError: return ["기타"]
+
+def parse_keywords(kw_data):
+    if isinstance(kw_data, list): return kw_data
+    try:
+        kws = orjson.loads(kw_data)
+        return kws if isinstance(kws, list) else []
+    except (orjson.JSONDecodeError, TypeError): return []
+
+def build_tags_html(cats, kws_list):
+    # 카테고리 배지 + 키워드 태그 (load_data에서 행마다 한 번만 생성)
+    # [요청 반영] # 중복 제거
+    kw_text = " ".join([f"#{k.replace('#', '')}" for k in kws_list])
+    badges = "".join([f'<span class="cat-badge">{c}</span>' for c in cats])
+    return f"<div class='tag-container'>{badges} <span class='keyword-text'>{kw_text}</span></div>"
 
 # -----------------------------------------------------------------------------
 # 2. AI 분석
 # -----------------------------------------------------------------------------
-def analyze_text(text):
-    if GOOGLE_API_KEY == "YOUR_API_KEY": return ["#API_KEY_없음"], ["기타"], "None"
+@st.cache_resource
+def configure_genai():
+    # google.generativeai, plotly는 import 비용이 커서 실제로 쓰는 함수 안에서 지연 import
+    import google.generativeai as genai
     genai.configure(api_key=GOOGLE_API_KEY)
-    for model_name in MODEL_PRIORITY_LIST:
+    return genai
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def get_available_models():
+    # 사용 가능한 모델 목록은 프로세스 단위로 1시간 캐시 (우선순위 순서 유지)
+    genai = configure_genai()
+    try:
+        available = {m.name.split("/")[-1] for m in genai.list_models()
+                     if "generateContent" in m.supported_generation_methods}
+    except Exception: return MODEL_PRIORITY_LIST # 목록 조회 실패 시 우선순위 목록 그대로 시도
+    return [m for m in MODEL_PRIORITY_LIST if m in available] or MODEL_PRIORITY_LIST
+
+@st.cache_resource
+def get_model(model_name):
+    # GenerativeModel 객체는 모델별로 한 번만 만들어 재사용
+    return configure_genai().GenerativeModel(model_name)
+
+@st.cache_resource
+def model_cooldowns():
+    # model_name -> 다시 시도해도 되는 시각. 쿼터는 API 키 단위이므로 세션이 아닌 프로세스 전체가 공유
+    return {}
+
+class ModelUnavailableError(RuntimeError):
+    # 입력과 무관한 모델 장애 (쿼터 초과/서버 오류/시간 초과/인증). 이 경우에만 쿨다운을 건다
+    pass
+
+def try_model(model, prompt, n, stop):
+    # 한 모델을 지수 백오프로 재시도. 워커 스레드에서 실행되므로 st.* 호출 없음
+    # 실패 원인이 모델 가용성이면 ModelUnavailableError, 입력/응답 문제(개수 불일치, JSON 오류, 안전 차단, 400)면 RuntimeError
+    from google.api_core import exceptions as api_exceptions # google-generativeai 의존성 (지연 import)
+    unavailable_errors = (api_exceptions.TooManyRequests, api_exceptions.ServerError, api_exceptions.Unauthorized,
+                          api_exceptions.Forbidden, api_exceptions.RetryError, OSError) # OSError: 네트워크/시간 초과
+    unavailable = False
+    for attempt in range(MODEL_MAX_ATTEMPTS):
+        if stop.is_set(): break # 다른 모델이 이미 답했거나 요청이 끝났으면 다시 호출하지 않음
         try:
-            model = genai.GenerativeModel(model_name)
-            prompt = f"텍스트를 분석해 JSON으로 응답해. keywords(2~3개, #포함), categories(1~2개). 텍스트: {text}"
-            response = model.generate_content(prompt)
-            result = json.loads(response.text.replace("```json", "").replace("```", "").strip())
-            kws = result.get("keywords", [])
-            cats = result.get("categories", ["기타"])
-            return kws, cats, model_name
-        except: time.sleep(1); continue
-    return ["#AI오류"], ["기타"], "None"
+            response = model.generate_content(prompt, request_options={"timeout": MODEL_TIMEOUT_SEC})
+            result = orjson.loads(response.text.replace("```json", "").replace("```", "").strip())
+            if isinstance(result, dict): result = [result]
+            if len(result) != n: raise ValueError("응답 개수 불일치")
+            return [(r.get("keywords", []), r.get("categories", ["기타"])) for r in result]
+        except Exception as e:
+            unavailable = isinstance(e, unavailable_errors)
+            # 인증 오류/잘못된 요청 등 429를 제외한 4xx는 다시 보내도 같으므로 대기 없이 바로 포기
+            if isinstance(e, api_exceptions.ClientError) and not isinstance(e, api_exceptions.TooManyRequests): break
+            if attempt + 1 < MODEL_MAX_ATTEMPTS:
+                if stop.wait(0.5 * 2 ** attempt + random.uniform(0, 0.5)): break # 백오프 중 중단 신호가 오면 바로 종료
+    if unavailable: raise ModelUnavailableError("모델 사용 불가")
+    raise RuntimeError("모델 분석 실패")
+
+@st.cache_data(ttl=24 * 3600, show_spinner=False, max_entries=500) # 서로 다른 텍스트가 계속 쌓이지 않게 LRU 상한
+def request_analysis(texts):
+    # texts(tuple)가 캐시 키 -> 같은 내용을 다시 저장/수정해도 Gemini를 다시 호출하지 않음.
+    # 모든 모델이 실패하면 예외를 올려 실패 결과가 캐시되지 않게 함
+    # 입력을 JSON 문자열 배열로 넘겨 경계를 명확히 함 (본문 안의 "2. ..." 같은 번호 목록이 항목으로 오인되지 않게)
+    prompt = (f"아래 JSON 배열의 문자열 {len(texts)}개를 각각 분석해, 같은 순서로 정확히 {len(texts)}개 객체를 담은 JSON 배열로 응답해. "
+              f"각 객체는 keywords(2~3개, #포함), categories(1~2개). 입력:\n{orjson.dumps(list(texts)).decode()}")
+    cooldowns = model_cooldowns()
+    # 최근 가용성 오류로 실패한 모델은 건너뜀. 모두 쿨다운 중이면 호출 0회로 끝내지 않고 전체 목록을 그대로 시도
+    models = get_available_models()
+    candidates = [m for m in models if cooldowns.get(m, 0) <= time.time()] or models
+    # 1순위 모델만 먼저 호출. MODEL_HEDGE_DELAY_SEC 안에 답이 없으면 백업 모델을 한 번만 추가하고,
+    # 그 뒤로는 실행 중인 호출이 실패할 때만 다음 모델을 하나씩 추가. 먼저 성공한 응답을 사용
+    stop = threading.Event() # 끝나면 set -> 남은 워커는 진행 중인 호출 이후 재시도하지 않음
+    queue = list(candidates)
+    pending = {}
+    ex = ThreadPoolExecutor(max_workers=len(candidates))
+    def launch():
+        model_name = queue.pop(0)
+        pending[ex.submit(try_model, get_model(model_name), prompt, len(texts), stop)] = model_name
+    try:
+        launch()
+        hedged = False
+        while pending:
+            timeout = MODEL_HEDGE_DELAY_SEC if not hedged and queue else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done: # 1순위가 느림 -> 백업 1개 추가 (시간 초과로 인한 추가는 한 번뿐)
+                hedged = True
+                launch()
+                continue
+            for future in done:
+                name = pending.pop(future)
+                try: return future.result(), name
+                except ModelUnavailableError: cooldowns[name] = time.time() + MODEL_COOLDOWN_SEC
+                except RuntimeError: pass # 특정 입력 때문일 수 있는 실패는 다른 세션까지 막지 않도록 쿨다운하지 않음
+                if queue: launch() # 실패한 호출 하나당 다음 모델 하나
+    finally:
+        stop.set()
+        ex.shutdown(wait=False, cancel_futures=True) # 먼저 성공하면 느린 쪽은 기다리지 않음
+    raise RuntimeError("모든 모델 분석 실패")
+
+def analyze_texts(texts):
+    # 여러 텍스트를 한 번의 요청으로 분석 -> ([(keywords, categories), ...], model_name)
+    if GOOGLE_API_KEY == "YOUR_API_KEY": return [(["#API_KEY_없음"], ["기타"]) for _ in texts], "None"
+    try: return request_analysis(tuple(texts))
+    except RuntimeError: return [(["#AI오류"], ["기타"]) for _ in texts], "None"
+
+def analyze_text(text):
+    results, model_name = analyze_texts([text])
+    kws, cats = results[0]
+    return kws, cats, model_name
 
 # -----------------------------------------------------------------------------
 # 3. 주차 관련 함수
 # -----------------------------------------------------------------------------
+WEEK_LABEL_RE = re.compile(r"^(\d+)년\s+(\d+)월\s+(\d+)주차$") # "25년 3월 2주차"
+
 def get_week_label_and_start(date_obj):
     if pd.isna(date_obj): return None, None
     if not isinstance(date_obj, pd.Timestamp):
@@ -125,45 +308,121 @@ def get_week_label_and_start(date_obj):
     start_of_week = date_obj - datetime.timedelta(days=date_obj.weekday())
     return label, start_of_week.normalize()
 
+def get_week_labels(dates):
+    # get_week_label_and_start의 라벨 부분을 .dt 접근자로 벡터화
+    week_of_month = (dates.dt.day - 1) // 7 + 1
+    return ((dates.dt.year % 100).astype(str) + "년 " + dates.dt.month.astype(str) + "월 "
+            + week_of_month.astype(str) + "주차")
+
 def get_all_week_options(df):
     if df.empty: return ["이번 주 기록"]
-    valid_dates = df['date'].dropna()
-    week_label_data = valid_dates.apply(lambda x: get_week_label_and_start(x))
-    week_labels = week_label_data.apply(lambda x: x[0]).unique()
-    
-    current_date = datetime.date.today()
-    current_week_label, _ = get_week_label_and_start(current_date)
-    
-    options = []
-    if current_week_label not in week_labels: options.append(current_week_label)
-    options.extend(week_labels)
-    options = list(pd.unique(options))
-    
-    def parse_sort(label):
-        if '년' in label:
-            parts = label.split()
-            try: return datetime.date(2000 + int(parts[0][:-1]), int(parts[1][:-1]), 1)
-            except: pass
-        return datetime.date(2100, 1, 1)
-    
-    options.sort(key=parse_sort, reverse=True)
-    return ["이번 주 기록"] + [o for o in options if o != current_week_label and o != "이번 주 기록"]
+    current_week_label, _ = get_week_label_and_start(datetime.date.today())
+
+    # 라벨 문자열을 파싱해 정렬하는 대신 주차별 최신 날짜로 정렬 (같은 달 안의 주차 순서도 보장)
+    dated = df[df['week_label'] != ""]
+    week_labels = dated.groupby('week_label', sort=False)['date'].max().sort_values(ascending=False).index
+    return ["이번 주 기록"] + [o for o in week_labels if o != current_week_label]
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_filter_options(version, _df, today):
+    # version(data_version)과 today가 캐시 키. _df는 해시하지 않음 (날짜가 바뀌면 '이번 주' 라벨도 다시 계산)
+    # 작성자 -> 행 위치 배열. 필터 시 전체 열 비교 대신 해당 작성자 행만 봄
+    writer_rows = _df.groupby('writer', sort=False).indices
+    # load_data에서 fillna("")를 거치므로 dropna 대신 빈 작성자를 제외
+    writers = ["전체"] + sorted(w for w in writer_rows if w != "")
+    return writers, get_all_week_options(_df), writer_rows
 
 def get_week_range(week_label):
     today = datetime.date.today()
     if week_label == "이번 주 기록":
         start = today - datetime.timedelta(days=today.weekday())
         return pd.to_datetime(start).normalize(), pd.to_datetime(start + datetime.timedelta(days=6)).normalize()
+    m = WEEK_LABEL_RE.match(week_label)
+    if not m: return get_week_range("이번 주 기록")
     try:
-        parts = week_label.split()
-        year, month, week_num = int(parts[0][:-1]) + 2000, int(parts[1][:-1]), int(parts[2][:-2])
+        year, month, week_num = int(m[1]) + 2000, int(m[2]), int(m[3])
         current_day = datetime.date(year, month, 1) + datetime.timedelta(days=(week_num - 1) * 7)
         start = current_day - datetime.timedelta(days=current_day.weekday())
         return pd.to_datetime(start).normalize(), pd.to_datetime(start + datetime.timedelta(days=6)).normalize()
-    except: return get_week_range("이번 주 기록")
+    except ValueError: return get_week_range("이번 주 기록") # 존재하지 않는 날짜 (예: 13월)
+
+# -----------------------------------------------------------------------------
+# 4. 대시보드 집계 (데이터가 바뀔 때만 재계산)
+# -----------------------------------------------------------------------------
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_dashboard(version, _df):
+    # version(data_version)만 캐시 키로 사용 -> rerun마다 프레임 전체를 해시하지 않음
+    df = _df
+    # 리스트 열을 explode로 펼쳐 pandas 안에서 집계 (빈 리스트는 NaN -> dropna)
+    # 위치 인덱스로 펼쳐서 카테고리 -> 행 위치 목록을 함께 만들어 둠 (목록 필터용)
+    all_cats = df['category_parsed'].reset_index(drop=True).explode().dropna()
+    all_kws = df['keywords_parsed'].explode().dropna()
+    cat_rows = {cat: pos.unique().to_numpy() for cat, pos in all_cats.index.groupby(all_cats).items()}
+
+    # mode()는 정렬 기반이므로 value_counts 결과를 재사용해 최빈값을 구함
+    cat_counts = all_cats.value_counts()
+    writer_counts = df['writer'].value_counts()
+    return {
+        "top_cat": cat_counts.index[0] if not cat_counts.empty else "-",
+        "kw_total": all_kws.nunique(),
+        "top_writer": writer_counts.index[0] if not writer_counts.empty else "-",
+        "cat_counts": cat_counts,
+        "kw_counts": all_kws.value_counts().head(10),
+        "cat_rows": cat_rows,
+    }
+
+# 그래프 객체는 집계 결과(튜플)가 같으면 프로세스 단위로 재사용
+@st.cache_resource(show_spinner=False)
+def build_treemap(cat_items):
+    import plotly.graph_objects as go
+    # px.treemap(path=...)의 DataFrame 계층 변환 없이 labels/parents/values를 바로 전달
+    labels = [c for c, _ in cat_items]
+    values = [v for _, v in cat_items]
+    fig = go.Figure(go.Treemap(
+        labels=labels, parents=[""] * len(labels), values=values,
+        marker=dict(colors=values, colorscale=[(0, PURPLE_PALETTE[400]), (1, PURPLE_PALETTE[900])], showscale=False)
+    ))
+
+    # [최종 해결] 템플릿 제거 및 배경색 '강제 주입'
+    fig.update_layout(
+        margin=dict(t=0, l=0, r=0, b=0),
+        height=350,
+        # template="plotly_dark", # 기본 회색 배경의 원인이므로 제거
+        paper_bgcolor=CARD_BG_COLOR, # 앱 배경색으로 강제 설정
+        plot_bgcolor=CARD_BG_COLOR,
+        font=dict(color="white", family="Pretendard")
+    )
+    fig.update_traces(
+        textfont=dict(size=18, color="white"), 
+        marker=dict(line=dict(width=1, color="#30333F")), 
+        texttemplate="<b>%{label}</b><br>%{value}건",
+        root_color=CARD_BG_COLOR # [중요] 부모 노드 배경색도 앱 배경색으로 설정
+    )
+    return fig
+
+@st.cache_resource(show_spinner=False)
+def build_pie(cat_items):
+    import plotly.express as px
+    fig_pie = px.pie(pd.DataFrame(cat_items, columns=['category', 'count']),
+                     values='count', names='category', hole=0.5,
+                     color_discrete_sequence=[PURPLE_PALETTE[x] for x in [500, 600, 700, 800, 900]])
+    fig_pie.update_layout(height=350, margin=dict(t=20, b=20, l=20, r=20), template="plotly_dark",
+                          paper_bgcolor=CARD_BG_COLOR, plot_bgcolor=CARD_BG_COLOR)
+    return fig_pie
+
+@st.cache_resource(show_spinner=False)
+def build_bar(kw_items):
+    import plotly.graph_objects as go
+    kw_counts = pd.DataFrame(kw_items, columns=['keyword', 'count'])
+    fig_bar = go.Figure(go.Bar(x=kw_counts['count'], y=kw_counts['keyword'], orientation='h',
+                               marker=dict(color=PURPLE_PALETTE[600]), text=kw_counts['count'], textposition='outside'))
+    fig_bar.update_layout(xaxis=dict(visible=False), yaxis=dict(autorange="reversed"),
+                          height=350, margin=dict(t=20, b=20, l=10, r=40),
+                          paper_bgcolor=CARD_BG_COLOR, plot_bgcolor=CARD_BG_COLOR, template="plotly_dark")
+    return fig_bar
 
 # -----------------------------------------------------------------------------
-# 4. Streamlit UI
+# 5. Streamlit UI
 # -----------------------------------------------------------------------------
 if 'edit_mode' not in st.session_state: st.session_state['edit_mode'] = False
 if 'edit_data' not in st.session_state: st.session_state['edit_data'] = {}
@@ -173,10 +432,86 @@ def confirm_delete_dialog(entry_id):
     st.write("삭제하시겠습니까?")
     c1, c2 = st.columns(2)
     if c1.button("삭제", type="primary", use_container_width=True):
-        delete_entry(entry_id); st.rerun()
+        try: delete_entry(entry_id)
+        except Exception: st.error("삭제하지 못했습니다. 잠시 후 다시 시도해주세요.")
+        else: st.rerun()
     if c2.button("취소", use_container_width=True): st.rerun()
 
-st.markdown(f"""
+def next_page(page_key):
+    st.session_state[page_key] += 1
+
+def iter_page(frame, page_key):
+    # 목록을 LIST_PAGE_SIZE씩 펼쳐 보여줌. 현재 페이지까지의 행을 내보낸 뒤, 남은 행이 있으면 '더 보기' 버튼을 그림
+    page = st.session_state.setdefault(page_key, 1)
+    yield from frame.head(LIST_PAGE_SIZE * page).itertuples(index=False)
+    if len(frame) > LIST_PAGE_SIZE * page:
+        st.button("더 보기", key=f"{page_key}_more", use_container_width=True, on_click=next_page, args=(page_key,))
+
+# 필터 위젯이 바뀌면 이 블록만 다시 실행 (대시보드/입력 폼은 건드리지 않음)
+@st.fragment
+def record_list_fragment(df):
+    if not df.empty:
+        writers, weeks, writer_rows = get_filter_options(data_version(df), df, datetime.date.today())
+
+        c_f1, c_f2 = st.columns(2)
+        w_filter = c_f1.selectbox("작성자 필터", writers)
+        t_filter = c_f2.selectbox("주차 필터", weeks)
+
+        start_dt, end_dt = get_week_range(t_filter)
+        w_df = df if w_filter == "전체" else df.iloc[writer_rows.get(w_filter, [])]
+        f_df = w_df[w_df['date'].between(start_dt, end_dt)] # 작성자는 위치 조회로 먼저 좁히고 날짜 마스크는 한 번만 만듦
+
+        st.caption(f"**필터링** (총 {len(f_df)}건, {start_dt.date()} ~ {end_dt.date()})")
+
+        # 행마다 수정/삭제 버튼(위젯)이 붙으므로 필터 조합별로 LIST_PAGE_SIZE씩만 그림
+        for row in iter_page(f_df, f"tab1_page_{w_filter}_{t_filter}"):
+            with st.container(border=True):
+                c_info, c_edit, c_del = st.columns([6, 1, 1])
+                c_info.markdown(f"<div class='info-block'><span class='writer-name'>{row.writer}</span><span class='date-info'>({row.date_str} 작성)</span></div>", unsafe_allow_html=True)
+
+                if c_edit.button("수정", key=f"edit_{row.id}", use_container_width=True):
+                    st.session_state['edit_mode'] = True
+                    st.session_state['edit_data'] = {'id': row.id} # 행 내용은 수정 화면에서 캐시된 df로 조회
+                    st.rerun()
+                if c_del.button("삭제", key=f"del_{row.id}", use_container_width=True):
+                    confirm_delete_dialog(row.id)
+
+                st.markdown("<hr>", unsafe_allow_html=True)
+                st.markdown(row.text) # 사용자 입력은 HTML 없이 마크다운으로만 (코드 블록/태그와 섞이지 않게 따로 그림)
+                st.markdown(row.tags_html, unsafe_allow_html=True)
+    else:
+        st.info("기록이 없습니다.")
+
+# 카테고리 선택이 바뀌면 목록만 다시 그림 (지표/차트는 재실행하지 않음)
+@st.fragment
+def category_list_fragment(df, stats):
+    unique_categories = sorted(stats['cat_counts'].index.tolist())
+
+    col_list_filter, _ = st.columns([1, 3])
+    with col_list_filter:
+        selected_cat_filter = st.selectbox("카테고리 선택", ["전체 보기"] + unique_categories, key="tab2_cat_filter")
+
+    if selected_cat_filter == "전체 보기":
+        f_df_dash = df
+    else:
+        f_df_dash = df.iloc[stats['cat_rows'].get(selected_cat_filter, [])]
+
+    if not f_df_dash.empty:
+        st.caption(f"총 {len(f_df_dash)}건")
+
+        # 카테고리별로 펼친 페이지 수를 기억하고, 그만큼만 카드로 그림
+        for row in iter_page(f_df_dash, f"tab2_page_{selected_cat_filter}"):
+            with st.container(border=True):
+                header = f"<div class='info-block'><span class='writer-name'>{row.writer}</span><span class='date-info'>{row.date_str}</span></div>"
+                st.markdown(header + "<hr>", unsafe_allow_html=True)
+                st.markdown(row.text)
+                st.markdown(row.tags_html, unsafe_allow_html=True)
+    else:
+        st.info("해당 카테고리의 글이 없습니다.")
+
+@st.cache_resource # 불변 문자열이므로 cache_data의 직렬화/복사 없이 그대로 재사용
+def build_css():
+    return f"""
     <style>
     @import url('https://cdn.jsdelivr.net/gh/orioncactus/pretendard@v1.3.9/dist/web/static/pretendard.min.css');
     * {{ font-family: 'Pretendard', sans-serif !important; }}
@@ -190,18 +525,24 @@ st.markdown(f"""
     .cat-badge {{ background-color: {PURPLE_PALETTE[800]}; color: white; padding: 3px 6px; border-radius: 10px; font-size: 0.8rem; font-weight: 500; margin-right: 5px; }}
     .keyword-text {{ color: {PURPLE_PALETTE[400]}; font-size: 0.8rem; font-weight: 500; }}
     </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(build_css(), unsafe_allow_html=True)
 
 st.title("Team Lesson Learned 🚀")
+try: df = load_data() # 두 탭이 같은 스냅샷을 공유
+except Exception:
+    st.error("기록을 불러오지 못했습니다. 잠시 후 다시 시도해주세요.")
+    df = pd.DataFrame(columns=["id", "date", "writer", "text", "keywords", "category"])
 tab1, tab2 = st.tabs(["📝 배움 기록하기", "📊 통합 대시보드"])
 
 with tab1:
-    df = load_data()
-    
     # --- 수정 모드 ---
     if st.session_state['edit_mode']:
         st.subheader("✏️ 기록 수정하기")
-        e_data = st.session_state['edit_data']
+        edit_id = st.session_state['edit_data'].get('id')
+        e_data = get_entry(df, edit_id)
+        if not e_data: st.warning("수정할 기록을 찾을 수 없습니다. (삭제되었을 수 있습니다)")
         writer_val = e_data.get('writer', '')
         text_val = e_data.get('text', '')
         date_val = e_data.get('date', datetime.date.today())
@@ -217,11 +558,14 @@ with tab1:
         if col_submit.button("수정 완료", type="primary", use_container_width=True):
             if new_writer and new_text:
                 with st.spinner("AI 재분석 중..."):
-                    kws, cats, _ = analyze_text(new_text)
-                    update_entry(e_data['id'], new_writer, new_text, kws, cats, new_date)
-                    st.success("✅ 수정 완료!")
-                    st.session_state['edit_mode'] = False
-                    st.rerun()
+                    try:
+                        kws, cats, _ = analyze_text(new_text) # AI 분석이 끝난 뒤에 시트를 읽어 씀
+                        update_entry(edit_id, new_writer, new_text, kws, cats, new_date)
+                    except Exception: st.error("수정 내용을 저장하지 못했습니다. 잠시 후 다시 시도해주세요.")
+                    else:
+                        st.success("✅ 수정 완료!")
+                        st.session_state['edit_mode'] = False
+                        st.rerun()
             else:
                 st.error("내용을 입력하세요.")
 
@@ -242,98 +586,40 @@ with tab1:
             if st.form_submit_button("기록 저장하기", type="primary", use_container_width=True):
                 if writer and text:
                     with st.spinner("AI 분석 중..."):
-                        kws, cats, _ = analyze_text(text)
-                        save_entry(str(uuid.uuid4()), writer, text, kws, cats, date_sel)
-                        st.success("✅ 저장 완료!")
-                        st.rerun()
+                        try:
+                            kws, cats, _ = analyze_text(text) # AI 분석이 끝난 뒤에 시트를 읽어 씀
+                            save_entry(str(uuid.uuid4()), writer, text, kws, cats, date_sel)
+                        except Exception:
+                            # clear_on_submit으로 입력창은 이미 비워졌으므로 작성한 내용을 보여줘 잃지 않게 함
+                            st.error("저장하지 못했습니다. 잠시 후 다시 시도해주세요. 작성한 내용은 아래에서 복사할 수 있습니다.")
+                            st.code(text, language=None)
+                        else:
+                            st.success("✅ 저장 완료!")
+                            st.rerun()
                 else:
                     st.error("작성자와 내용을 입력해주세요.")
 
     st.divider()
     st.subheader("🔍 기록 조회")
     
-    if not df.empty:
-        writers = ["전체"] + sorted(df['writer'].unique().tolist())
-        weeks = get_all_week_options(df)
-        
-        c_f1, c_f2 = st.columns(2)
-        w_filter = c_f1.selectbox("작성자 필터", writers)
-        t_filter = c_f2.selectbox("주차 필터", weeks)
-        
-        start_dt, end_dt = get_week_range(t_filter)
-        f_df = df[(df['date'] >= start_dt) & (df['date'] <= end_dt)].copy()
-        if w_filter != "전체": f_df = f_df[f_df['writer'] == w_filter]
-        
-        st.caption(f"**필터링** (총 {len(f_df)}건, {start_dt.date()} ~ {end_dt.date()})")
-        
-        for _, row in f_df.sort_values("date", ascending=False).iterrows():
-            with st.container(border=True):
-                c_info, c_edit, c_del = st.columns([6, 1, 1])
-                d_str = row['date'].strftime('%Y-%m-%d')
-                c_info.markdown(f"<div class='info-block'><span class='writer-name'>{row['writer']}</span><span class='date-info'>({d_str} 작성)</span></div>", unsafe_allow_html=True)
-                
-                if c_edit.button("수정", key=f"edit_{row['id']}", use_container_width=True):
-                    st.session_state['edit_mode'] = True
-                    st.session_state['edit_data'] = row.to_dict()
-                    st.rerun()
-                if c_del.button("삭제", key=f"del_{row['id']}", use_container_width=True):
-                    confirm_delete_dialog(row['id'])
-                
-                st.markdown("<hr>", unsafe_allow_html=True)
-                st.markdown(row['text'])
-                
-                cats = parse_categories(row['category'])
-                try: kws_list = json.loads(row['keywords'])
-                except: kws_list = []
-                
-                # [요청 반영] # 중복 제거
-                kw_text = " ".join([f"#{k.replace('#', '')}" for k in kws_list])
-                badges = "".join([f'<span class="cat-badge">{c}</span>' for c in cats])
-                st.markdown(f"<div class='tag-container'>{badges} <span class='keyword-text'>{kw_text}</span></div>", unsafe_allow_html=True)
-    else:
-        st.info("기록이 없습니다.")
+    record_list_fragment(df)
 
 with tab2:
-    df = load_data()
     if not df.empty:
-        all_cats = []
-        for c in df['category']: all_cats.extend(parse_categories(c))
-        
-        try: all_kws = [k for row in df['keywords'] for k in json.loads(row)]
-        except: all_kws = []
+        stats = compute_dashboard(data_version(df), df)
+        cat_counts = stats['cat_counts']
 
         st.subheader("Key Metrics")
         k1, k2, k3, k4 = st.columns(4)
         k1.metric("총 기록 수", f"{len(df)}건")
-        k2.metric("Top 카테고리", pd.Series(all_cats).mode()[0] if all_cats else "-")
-        k3.metric("누적 키워드", f"{len(set(all_kws))}개")
-        k4.metric("최다 작성자", df['writer'].mode()[0] if not df['writer'].empty else "-")
+        k2.metric("Top 카테고리", stats['top_cat'])
+        k3.metric("누적 키워드", f"{stats['kw_total']}개")
+        k4.metric("최다 작성자", stats['top_writer'])
         
         st.divider()
         st.subheader("🗺️ Lesson Map (카테고리 비중)")
-        if all_cats:
-            cat_counts = pd.Series(all_cats).value_counts().reset_index()
-            cat_counts.columns = ['Category', 'Value']
-            
-            fig = px.treemap(cat_counts, path=['Category'], values='Value', color='Value',
-                             color_continuous_scale=[(0, PURPLE_PALETTE[400]), (1, PURPLE_PALETTE[900])])
-            
-            # [최종 해결] 템플릿 제거 및 배경색 '강제 주입'
-            fig.update_layout(
-                margin=dict(t=0, l=0, r=0, b=0),
-                height=350,
-                # template="plotly_dark", # 기본 회색 배경의 원인이므로 제거
-                paper_bgcolor=CARD_BG_COLOR, # 앱 배경색으로 강제 설정
-                plot_bgcolor=CARD_BG_COLOR,
-                font=dict(color="white", family="Pretendard"), 
-                coloraxis_showscale=False
-            )
-            fig.update_traces(
-                textfont=dict(size=18, color="white"), 
-                marker=dict(line=dict(width=1, color="#30333F")), 
-                texttemplate="<b>%{label}</b><br>%{value}건",
-                root_color=CARD_BG_COLOR # [중요] 부모 노드 배경색도 앱 배경색으로 설정
-            )
+        if not cat_counts.empty:
+            fig = build_treemap(tuple(cat_counts.items()))
             st.plotly_chart(fig, use_container_width=True, theme=None)
         else:
             st.info("데이터 부족")
@@ -345,59 +631,19 @@ with tab2:
         
         with c_pie:
             st.caption("Category Ratio")
-            if all_cats:
-                fig_pie = px.pie(pd.Series(all_cats).value_counts().reset_index(name='count').rename(columns={'index':'category'}), 
-                                 values='count', names='category', hole=0.5,
-                                 color_discrete_sequence=[PURPLE_PALETTE[x] for x in [500, 600, 700, 800, 900]])
-                fig_pie.update_layout(height=350, margin=dict(t=20, b=20, l=20, r=20), template="plotly_dark",
-                                      paper_bgcolor=CARD_BG_COLOR, plot_bgcolor=CARD_BG_COLOR)
+            if not cat_counts.empty:
+                fig_pie = build_pie(tuple(cat_counts.items()))
                 st.plotly_chart(fig_pie, use_container_width=True, theme=None)
             else: st.info("데이터 부족")
         
         with c_bar:
             st.caption("Top 10 Keywords")
-            if all_kws:
-                kw_counts = pd.Series(all_kws).value_counts().head(10).reset_index()
-                kw_counts.columns = ['keyword', 'count']
-                fig_bar = go.Figure(go.Bar(x=kw_counts['count'], y=kw_counts['keyword'], orientation='h',
-                                           marker=dict(color=PURPLE_PALETTE[600]), text=kw_counts['count'], textposition='outside'))
-                fig_bar.update_layout(xaxis=dict(visible=False), yaxis=dict(autorange="reversed"),
-                                      height=350, margin=dict(t=20, b=20, l=10, r=40),
-                                      paper_bgcolor=CARD_BG_COLOR, plot_bgcolor=CARD_BG_COLOR, template="plotly_dark")
+            if not stats['kw_counts'].empty:
+                fig_bar = build_bar(tuple(stats['kw_counts'].items()))
                 st.plotly_chart(fig_bar, use_container_width=True, theme=None)
             else: st.info("데이터 부족")
 
         st.divider()
         st.subheader("🗂️ 전체 레슨런 목록 (카테고리 필터)")
         
-        unique_categories = sorted(list(set(all_cats)))
-        
-        col_list_filter, _ = st.columns([1, 3])
-        with col_list_filter:
-            selected_cat_filter = st.selectbox("카테고리 선택", ["전체 보기"] + unique_categories, key="tab2_cat_filter")
-        
-        if selected_cat_filter == "전체 보기":
-            f_df_dash = df.copy()
-        else:
-            f_df_dash = df[df['category'].apply(lambda x: selected_cat_filter in parse_categories(x))]
-        
-        if not f_df_dash.empty:
-            f_df_dash = f_df_dash.sort_values(by="date", ascending=False)
-            st.caption(f"총 {len(f_df_dash)}건")
-            
-            for _, row in f_df_dash.iterrows():
-                with st.container(border=True):
-                    d_str = row['date'].strftime('%Y-%m-%d')
-                    st.markdown(f"<div class='info-block'><span class='writer-name'>{row['writer']}</span><span class='date-info'>{d_str}</span></div>", unsafe_allow_html=True)
-                    st.markdown("<hr>", unsafe_allow_html=True)
-                    st.markdown(row['text'])
-                    
-                    cats = parse_categories(row['category'])
-                    try: kws_list = json.loads(row['keywords'])
-                    except: kws_list = []
-                    
-                    kw_text = " ".join([f"#{k.replace('#', '')}" for k in kws_list])
-                    badges = "".join([f'<span class="cat-badge">{c}</span>' for c in cats])
-                    st.markdown(f"<div class='tag-container'>{badges} <span class='keyword-text'>{kw_text}</span></div>", unsafe_allow_html=True)
-        else:
-            st.info("해당 카테고리의 글이 없습니다.")
+        category_list_fragment(df, stats)